@@ -1,116 +1,442 @@
 import streamlit as st
 import sqlite3
+import queue
 import pandas as pd
+from contextlib import contextmanager
 from datetime import datetime
 
 DB_FILE = "loyalty.db"
 POINTS_PER_DOLLAR = 10 # Business Rule: 10 points per $1 spent
 GOLD_TIER_THRESHOLD = 500 # Business Rule: Spend $500 in a year for Gold
-
-# --- Database Connection Function ---
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False) # check_same_thread=False is needed for Streamlit
+POOL_SIZE = 8 # Number of long-lived connections shared by the app
+
+# --- SQL Statements ---
+# Hoisted to module level so every call executes the exact same string and
+# hits sqlite3's C-side prepared-statement cache instead of re-preparing.
+SQL_GET_CUSTOMER = "SELECT * FROM Customers WHERE email = ?"
+SQL_GET_CUSTOMER_STATE = "SELECT customer_id, tier, ytd_earn, ytd_year FROM Customers WHERE email = ?"
+SQL_GET_BALANCE = "SELECT balance FROM Customers WHERE customer_id = ?"
+SQL_GET_YTD = "SELECT ytd_earn, ytd_year FROM Customers WHERE customer_id = ?"
+SQL_GET_TIER_STATE = "SELECT tier, ytd_earn, ytd_year FROM Customers WHERE customer_id = ?"
+SQL_GET_REWARDS = "SELECT reward_id, name, points_cost FROM Rewards ORDER BY points_cost ASC"
+SQL_GET_HISTORY = """
+    SELECT timestamp, transaction_type, points_change, note
+    FROM PointsLedger
+    WHERE customer_id = ?
+    ORDER BY timestamp DESC
+"""
+SQL_INSERT_LEDGER = """
+    INSERT INTO PointsLedger (customer_id, points_change, transaction_type, note)
+    VALUES (?, ?, ?, ?)
+"""
+SQL_INSERT_LEDGER_PREFIX = "INSERT INTO PointsLedger (customer_id, points_change, transaction_type, note) VALUES "
+SQL_BUMP_BALANCE = "UPDATE Customers SET balance = balance + ? WHERE customer_id = ?"
+SQL_UPDATE_TIER = "UPDATE Customers SET tier = ? WHERE customer_id = ? AND tier <> ?"
+
+# --- Database Connection Pool ---
+def _create_connection():
+    """Creates one long-lived connection with its page cache tuned to stay hot."""
+    # check_same_thread=False is needed for Streamlit; cached_statements is
+    # sized comfortably above our distinct statement count
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False, cached_statements=128)
     # Return rows as dictionaries (easier to work with)
     conn.row_factory = sqlite3.Row
+    # Set once per connection; the cache then stays warm across queries.
+    # WAL + NORMAL lets readers run alongside writers and collapses the
+    # two-fsync journal dance to one, without risking corruption on crash.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA wal_autocheckpoint=1000") # Checkpoint every ~1000 pages
+    conn.execute("PRAGMA mmap_size=268435456") # Read pages via mmap (256MB window)
+    conn.execute("PRAGMA busy_timeout=5000") # Wait for writers instead of failing fast
+    conn.execute("PRAGMA cache_size=-20000") # ~20MB page cache
+    conn.execute("PRAGMA temp_store=MEMORY")
     return conn
 
-# --- Database Helper Functions ---
-def get_customer_by_email(email):
-    """Finds a customer by their email address."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Customers WHERE email = ?", (email,))
-    customer = cursor.fetchone()
+class ConnectionPool:
+    """A simple fixed-size pool so connections are reused instead of reopened per query."""
+    def __init__(self, size=POOL_SIZE):
+        self._connections = queue.Queue(maxsize=size)
+        for _ in range(size):
+            self._connections.put(_create_connection())
+
+    @contextmanager
+    def acquire(self):
+        """Checks a connection out of the pool and returns it when the block exits."""
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn) # Return to the pool instead of closing
+
+@st.cache_resource
+def get_db_pool():
+    """Creates the shared connection pool (one per Streamlit server process)."""
+    return ConnectionPool()
+
+@st.cache_resource
+def init_db():
+    """Creates the schema if needed and runs one-time setup, once per server process."""
+    conn = sqlite3.connect(DB_FILE)
+    # Idempotent bootstrap: a fresh deployment gets the full schema, an
+    # existing database is untouched. The covering index makes the
+    # per-customer ledger aggregations index-only scans. email needs no
+    # extra index — its UNIQUE constraint already provides one.
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS Customers (
+            customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            tier TEXT DEFAULT 'Standard',
+            balance INTEGER NOT NULL DEFAULT 0,
+            ytd_earn INTEGER NOT NULL DEFAULT 0,
+            ytd_year INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS Rewards (
+            reward_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            points_cost INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS PointsLedger (
+            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            points_change INTEGER NOT NULL,
+            transaction_type TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            note TEXT,
+            FOREIGN KEY (customer_id) REFERENCES Customers (customer_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_ledger_cust_type_ts
+        ON PointsLedger (customer_id, transaction_type, timestamp, points_change);
+    """)
+    # One-time migration: keep the hot balance value as a column on Customers
+    # so reads are a primary-key lookup instead of a ledger-wide SUM.
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(Customers)")]
+    if 'balance' not in columns:
+        conn.execute("ALTER TABLE Customers ADD COLUMN balance INTEGER NOT NULL DEFAULT 0")
+        conn.execute("""
+            UPDATE Customers
+            SET balance = (SELECT COALESCE(SUM(points_change), 0)
+                           FROM PointsLedger
+                           WHERE PointsLedger.customer_id = Customers.customer_id)
+        """)
+    # One-time migration: materialized year-to-date earn counter, so tier
+    # checks read one row instead of range-scanning the ledger.
+    if 'ytd_earn' not in columns:
+        conn.execute("ALTER TABLE Customers ADD COLUMN ytd_earn INTEGER NOT NULL DEFAULT 0")
+        conn.execute("ALTER TABLE Customers ADD COLUMN ytd_year INTEGER")
+        # Bind the start-of-year bound as a constant parameter: a plain
+        # single-sided 'timestamp >= ?' range is what the covering index
+        # plans best, and the year matches the app's local clock.
+        current_year = datetime.now().year
+        conn.execute("""
+            UPDATE Customers
+            SET ytd_earn = (SELECT COALESCE(SUM(points_change), 0)
+                            FROM PointsLedger
+                            WHERE customer_id = Customers.customer_id
+                              AND transaction_type = 'earn'
+                              AND timestamp >= ?),
+                ytd_year = ?
+        """, (f"{current_year}-01-01", current_year))
+    # The trigger keeps ytd_earn current for every earn insert, including
+    # batch paths, and rolls the counter over when the year changes.
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_ledger_earn
+        AFTER INSERT ON PointsLedger
+        WHEN NEW.transaction_type = 'earn'
+        BEGIN
+            UPDATE Customers
+            SET ytd_earn = CASE WHEN ytd_year = CAST(strftime('%Y', NEW.timestamp) AS INTEGER)
+                                THEN ytd_earn + NEW.points_change
+                                ELSE NEW.points_change END,
+                ytd_year = CAST(strftime('%Y', NEW.timestamp) AS INTEGER)
+            WHERE customer_id = NEW.customer_id;
+        END
+    """)
+    conn.commit()
     conn.close()
-    return customer
 
+# --- Database Helper Functions ---
+@st.cache_data(ttl=30)
+def get_customer_by_email(email):
+    """Finds a customer by their email address. Cached briefly across reruns."""
+    with get_db_pool().acquire() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SQL_GET_CUSTOMER, (email,))
+        customer = cursor.fetchone()
+    # Plain dict so the result is picklable for Streamlit's cache
+    return dict(customer) if customer else None
+
+@st.cache_data(ttl=5, max_entries=1024)
 def get_customer_point_balance(customer_id):
-    """Calculates the current point balance for a customer."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT SUM(points_change) FROM PointsLedger WHERE customer_id = ?", (customer_id,))
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result and result[0] is not None else 0
+    """Reads the current point balance for a customer. Memoized across reruns."""
+    # O(1) primary-key read of the denormalized balance column, maintained
+    # by every write path, instead of an O(ledger) SUM.
+    with get_db_pool().acquire() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SQL_GET_BALANCE, (customer_id,))
+        result = cursor.fetchone()
+    return result['balance'] if result else 0
 
 def get_customer_point_history(customer_id):
-    """Retrieves the point transaction history for a customer."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT timestamp, transaction_type, points_change, note
-        FROM PointsLedger
-        WHERE customer_id = ?
-        ORDER BY timestamp DESC
-    """, (customer_id,))
-    history = cursor.fetchall()
-    conn.close()
-    return history
-
+    """Retrieves the point transaction history for a customer as a DataFrame.
+
+    Columns use the Arrow dtype backend: Streamlit serializes rendered
+    frames to Arrow for the browser anyway, so Arrow-backed columns hand
+    the data over without another copy, and large histories avoid the
+    per-value numpy object boxing of the default backend.
+    """
+    with get_db_pool().acquire() as conn:
+        return pd.read_sql_query(SQL_GET_HISTORY, conn, params=(customer_id,),
+                                 parse_dates=['timestamp'], dtype_backend="pyarrow")
+
+@st.cache_data(ttl=300)
 def get_available_rewards():
-    """Retrieves all available rewards from the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT reward_id, name, points_cost FROM Rewards ORDER BY points_cost ASC")
-    rewards = cursor.fetchall()
-    conn.close()
-    return rewards
+    """Retrieves all available rewards from the database. Rewards change rarely, so cache for 5 minutes."""
+    with get_db_pool().acquire() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SQL_GET_REWARDS)
+        rewards = cursor.fetchall()
+    return [dict(r) for r in rewards]
+
+def _bump_balances(conn, rows):
+    """Applies a batch's net point change to each customer's balance column.
+
+    Must run inside the same transaction as the ledger insert so the
+    denormalized balance never drifts from the ledger.
+    """
+    totals = {}
+    for customer_id, points_change, _type, _note in rows:
+        totals[customer_id] = totals.get(customer_id, 0) + points_change
+    conn.executemany(SQL_BUMP_BALANCE,
+                     [(delta, customer_id) for customer_id, delta in totals.items()])
+
+def add_points_transactions(conn, rows):
+    """Inserts a batch of ledger rows in a single transaction.
+
+    rows is an iterable of (customer_id, points_change, transaction_type, note)
+    tuples. executemany reuses one prepared statement and the whole batch
+    commits with one fsync instead of one per row.
+    """
+    rows = list(rows)
+    with conn:
+        conn.executemany(SQL_INSERT_LEDGER, rows)
+        _bump_balances(conn, rows)
+    get_customer_point_balance.clear() # Balances just changed; drop stale cache entries
 
 def add_points_transaction(customer_id, points, transaction_type, note):
     """Adds a new transaction to the PointsLedger."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO PointsLedger (customer_id, points_change, transaction_type, note)
-        VALUES (?, ?, ?, ?)
-    """, (customer_id, points, transaction_type, note))
-    conn.commit()
-    conn.close()
+    with get_db_pool().acquire() as conn:
+        add_points_transactions(conn, [(customer_id, points, transaction_type, note)])
+
+ROWS_PER_INSERT = 200 # Keeps each statement well under SQLite's bound-parameter ceiling
+
+def insert_ledger_multi(conn, rows):
+    """Inserts several ledger rows with one multi-row VALUES statement.
+
+    Compound business events (e.g. a redemption plus a bonus or correction)
+    land in the ledger with a single prepare/step instead of one statement
+    per row. Batches larger than ROWS_PER_INSERT split across statements,
+    all inside one transaction.
+    """
+    rows = list(rows)
+    with conn:
+        cursor = conn.cursor()
+        for start in range(0, len(rows), ROWS_PER_INSERT):
+            chunk = rows[start:start + ROWS_PER_INSERT]
+            placeholders = ", ".join(["(?, ?, ?, ?)"] * len(chunk))
+            params = [value for row in chunk for value in row]
+            cursor.execute(SQL_INSERT_LEDGER_PREFIX + placeholders, params)
+        _bump_balances(conn, rows)
+    get_customer_point_balance.clear()
 
 def get_customer_spending_this_year(customer_id):
     """Calculates customer's total spending based on 'earn' transactions this year."""
     # Note: This is a simplified calculation based on points earned.
     # A real system would link points to specific order amounts.
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    current_year = datetime.now().year
-    start_of_year = f"{current_year}-01-01 00:00:00"
-    end_of_year = f"{current_year}-12-31 23:59:59"
-
-    cursor.execute("""
-        SELECT SUM(points_change)
-        FROM PointsLedger
-        WHERE customer_id = ?
-        AND transaction_type = 'earn'
-        AND timestamp BETWEEN ? AND ?
-    """, (customer_id, start_of_year, end_of_year))
-    result = cursor.fetchone()
-    conn.close()
-    points_earned_this_year = result[0] if result and result[0] is not None else 0
+    # Reads the trigger-maintained ytd_earn counter instead of scanning the ledger.
+    with get_db_pool().acquire() as conn:
+        cursor = conn.cursor()
+        cursor.execute(SQL_GET_YTD, (customer_id,))
+        row = cursor.fetchone()
+    if row is None or row['ytd_year'] != datetime.now().year:
+        return 0
     # Assuming points_per_dollar, calculate approximate spending
-    spending_this_year = points_earned_this_year / POINTS_PER_DOLLAR
-    return spending_this_year
+    return row['ytd_earn'] / POINTS_PER_DOLLAR
+
 
+def _check_tier(cursor, customer_id):
+    """Recomputes the tier inside the caller's open transaction.
 
-def update_customer_tier(customer_id):
-    """Checks customer spending and updates tier if necessary."""
-    spending = get_customer_spending_this_year(customer_id)
+    Returns the new tier name if it changed, otherwise None.
+    """
+    cursor.execute(SQL_GET_TIER_STATE, (customer_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    # ytd_earn is trigger-maintained, so no ledger scan is needed here
+    points_this_year = row['ytd_earn'] if row['ytd_year'] == datetime.now().year else 0
+    spending = points_this_year / POINTS_PER_DOLLAR
     new_tier = "Gold" if spending >= GOLD_TIER_THRESHOLD else "Standard"
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    # Get current tier first to avoid unnecessary updates
-    cursor.execute("SELECT tier FROM Customers WHERE customer_id = ?", (customer_id,))
-    current_tier = cursor.fetchone()['tier']
+    if new_tier != row['tier']:
+        cursor.execute(SQL_UPDATE_TIER, (new_tier, customer_id, new_tier))
+        get_customer_by_email.clear() # Drop cached rows so the new tier shows immediately
+        st.session_state.pop("customer", None) # ... including the session copy
+        return new_tier
+    return None
+
 
-    if new_tier != current_tier:
-        cursor.execute("UPDATE Customers SET tier = ? WHERE customer_id = ?", (new_tier, customer_id))
-        conn.commit()
+def _tier_check_needed(customer, points_to_add=0):
+    """Returns True only when a write could actually flip the stored tier.
+
+    Earned points only ever increase a year's total, so a Gold customer can
+    only be demoted after a year rollover, and a Standard customer can only
+    be promoted when this event pushes the year's earn over the threshold.
+    Everything else is a guaranteed no-op and skips the check entirely.
+    """
+    current_year = datetime.now().year
+    if customer['tier'] == 'Gold':
+        return customer['ytd_year'] != current_year
+    ytd_before = customer['ytd_earn'] if customer['ytd_year'] == current_year else 0
+    return (ytd_before + points_to_add) >= GOLD_TIER_THRESHOLD * POINTS_PER_DOLLAR
+
+
+def update_customer_tier(conn, customer_id):
+    """Checks customer spending and updates tier if necessary, in one transaction."""
+    # One explicit transaction: the spending read, tier compare and update
+    # commit together with a single fsync instead of one per statement.
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        new_tier = _check_tier(cursor, customer_id)
+    if new_tier:
         st.success(f"Customer tier updated to {new_tier}!") # Give feedback in the app
-    conn.close()
 
 
+def record_purchase(conn, email, amount, order_id):
+    """Records a purchase end-to-end in a single transaction.
+
+    Looks up the customer, inserts the earn transaction and rechecks the
+    tier on one connection with one commit. Returns (points_added, new_tier)
+    or None if the email is unknown.
+    """
+    points_to_add = int(amount * POINTS_PER_DOLLAR)
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(SQL_GET_CUSTOMER_STATE, (email,))
+        customer = cursor.fetchone()
+        if customer is None:
+            return None
+        cursor.execute(SQL_INSERT_LEDGER,
+                       (customer['customer_id'], points_to_add, 'earn', f"Order #{order_id}"))
+        cursor.execute(SQL_BUMP_BALANCE, (points_to_add, customer['customer_id']))
+        new_tier = None
+        if _tier_check_needed(customer, points_to_add):
+            new_tier = _check_tier(cursor, customer['customer_id'])
+    get_customer_point_balance.clear()
+    return points_to_add, new_tier
+
+
+def record_redemption(conn, customer_id, points_cost, reward_name):
+    """Records a reward redemption as a single committed transaction."""
+    # Routed through the multi-row path so a future redeem+bonus compound
+    # event stays a single statement.
+    insert_ledger_multi(conn, [(customer_id, -points_cost, 'redeem', f"Redeemed: {reward_name}")])
+
+
+def record_adjustment(conn, email, points, reason):
+    """Records a manual adjustment and rechecks the tier in one transaction.
+
+    Returns the new tier if it changed, None if it did not, or False if the
+    email is unknown.
+    """
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(SQL_GET_CUSTOMER_STATE, (email,))
+        customer = cursor.fetchone()
+        if customer is None:
+            return False
+        cursor.execute(SQL_INSERT_LEDGER,
+                       (customer['customer_id'], points, 'manual_adjust', reason))
+        cursor.execute(SQL_BUMP_BALANCE, (points, customer['customer_id']))
+        # Adjustments don't count as 'earn', so the tier can only move if the
+        # stored value is stale from a year rollover
+        new_tier = None
+        if _tier_check_needed(customer):
+            new_tier = _check_tier(cursor, customer['customer_id'])
+    get_customer_point_balance.clear()
+    return new_tier
+
+
+def record_bulk_adjustments(conn, adjustments):
+    """Applies a batch of (email, points, reason) adjustments in one transaction.
+
+    All emails resolve to customer ids with chunked IN queries, the ledger
+    rows go in with one executemany, balances update per customer and the
+    affected tiers recompute with a single set-based UPDATE — one commit and
+    one fsync for the whole batch. Returns (applied_count, unknown_emails).
+    """
+    emails = list({email for email, _points, _reason in adjustments})
+    ids_by_email = {}
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        for start in range(0, len(emails), ROWS_PER_INSERT):
+            chunk = emails[start:start + ROWS_PER_INSERT]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute("SELECT customer_id, email FROM Customers WHERE email IN (%s)" % placeholders,
+                           chunk)
+            ids_by_email.update({row['email']: row['customer_id'] for row in cursor.fetchall()})
+
+        unknown = sorted({email for email, _points, _reason in adjustments
+                          if email not in ids_by_email})
+        rows = [(ids_by_email[email], points, 'manual_adjust', reason)
+                for email, points, reason in adjustments if email in ids_by_email]
+        if rows:
+            cursor.executemany(SQL_INSERT_LEDGER, rows)
+            _bump_balances(conn, rows)
+            # Adjustments don't touch ytd_earn, so only tiers left stale by a
+            # year rollover can move; one UPDATE fixes every affected customer
+            affected = sorted({customer_id for customer_id, _p, _t, _n in rows})
+            threshold_points = GOLD_TIER_THRESHOLD * POINTS_PER_DOLLAR
+            current_year = datetime.now().year
+            cursor.execute("""
+                UPDATE Customers
+                SET tier = CASE WHEN ytd_year = ? AND ytd_earn >= ? THEN 'Gold' ELSE 'Standard' END
+                WHERE customer_id IN (%s)
+                  AND tier <> CASE WHEN ytd_year = ? AND ytd_earn >= ? THEN 'Gold' ELSE 'Standard' END
+            """ % ", ".join("?" * len(affected)),
+                [current_year, threshold_points] + affected + [current_year, threshold_points])
+    get_customer_point_balance.clear()
+    get_customer_by_email.clear()
+    st.session_state.pop("customer", None)
+    return len(rows), unknown
+
+
+# --- Session Helpers ---
+def _clear_cached_customer():
+    """Drops the session's cached customer when the email input changes."""
+    st.session_state.pop("customer", None)
+
+def resolve_customer(email):
+    """Resolves an email to a customer dict, cached in st.session_state.
+
+    Widget interactions rerun the whole script; keeping the resolved
+    customer in the session means those reruns skip the lookup entirely
+    as long as the email field hasn't changed.
+    """
+    cached = st.session_state.get("customer")
+    if cached and cached.get("email") == email:
+        return cached
+    customer = get_customer_by_email(email)
+    st.session_state["customer"] = customer
+    return customer
+
 # --- Page Setup ---
 st.set_page_config(
     page_title="UrbanThread Loyalty",
@@ -118,6 +444,8 @@ st.set_page_config(
     layout="wide"
 )
 
+init_db()
+
 st.title("✨ UrbanThread Loyalty Program Dashboard ✨")
 st.markdown("---") # Add a horizontal line
 
@@ -127,9 +455,9 @@ page = st.sidebar.radio("Go to", ["Customer View", "Add Points (Purchase)", "Red
 st.sidebar.markdown("---")
 # Add a little status indicator for DB connection
 try:
-    conn_check = get_db_connection()
+    with get_db_pool().acquire() as conn_check:
+        conn_check.execute("SELECT 1")
     st.sidebar.success("DB Connected")
-    conn_check.close()
 except Exception as e:
     st.sidebar.error(f"DB Error: {e}")
 
@@ -139,10 +467,11 @@ if page == "Customer View":
     st.header("👤 Customer View")
 
     # --- Input: Customer Email ---
-    customer_email = st.text_input("Enter Customer Email:", key="customer_email_input_view")
+    customer_email = st.text_input("Enter Customer Email:", key="customer_email_input_view",
+                                   on_change=_clear_cached_customer)
 
     if customer_email:
-        customer = get_customer_by_email(customer_email)
+        customer = resolve_customer(customer_email)
 
         if customer:
             st.subheader(f"Welcome, {customer['first_name']} {customer['last_name']}!")
@@ -152,27 +481,26 @@ if page == "Customer View":
             with col2:
                 st.write(f"**Current Tier:** {customer['tier']}")
 
-            current_balance = get_customer_point_balance(customer['customer_id'])
+            # The history already contains every ledger row, so derive the
+            # balance from it instead of issuing a second SUM query.
+            history_df = get_customer_point_history(customer['customer_id'])
+            current_balance = int(history_df['points_change'].sum())
             st.metric(label="Current Point Balance", value=f"{current_balance:,} Points ✨") # Added comma formatting
             st.markdown("---")
 
             # --- Show Point History ---
             st.subheader("Point Transaction History")
-            history = get_customer_point_history(customer['customer_id'])
-
-            if history:
-                # Convert list of Row objects to DataFrame
-                history_df = pd.DataFrame([dict(row) for row in history])
-                # Reorder columns for better readability
-                history_df = history_df[['timestamp', 'transaction_type', 'points_change', 'note']]
-                # Optional: Format timestamp
-                history_df['timestamp'] = pd.to_datetime(history_df['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
-                st.dataframe(history_df.rename(columns={
-                    'timestamp': 'Timestamp',
-                    'transaction_type': 'Type',
-                    'points_change': 'Points Change',
-                    'note': 'Note'
-                }), use_container_width=True)
+
+            if not history_df.empty:
+                # Keep timestamps as datetime64 and let the Arrow serializer
+                # format them column-wise instead of allocating a Python
+                # string per row.
+                st.dataframe(history_df, use_container_width=True, column_config={
+                    'timestamp': st.column_config.DatetimeColumn("Timestamp", format="YYYY-MM-DD HH:mm:ss"),
+                    'transaction_type': "Type",
+                    'points_change': "Points Change",
+                    'note': "Note"
+                })
             else:
                 st.write("No point history found.")
 
@@ -190,27 +518,28 @@ elif page == "Add Points (Purchase)":
         if not customer_email or not purchase_amount or not order_id:
             st.warning("Please fill in all fields.")
         else:
-            customer = get_customer_by_email(customer_email)
-            if customer:
-                points_to_add = int(purchase_amount * POINTS_PER_DOLLAR)
-                transaction_note = f"Order #{order_id}"
-                try:
-                    add_points_transaction(customer['customer_id'], points_to_add, 'earn', transaction_note)
-                    st.success(f"Successfully added {points_to_add} points for customer {customer_email} (Order: {order_id}).")
-                    # Check and update tier after adding points
-                    update_customer_tier(customer['customer_id'])
-                except Exception as e:
-                    st.error(f"Failed to add points: {e}")
-            else:
-                st.error("Customer email not found.")
+            try:
+                # Lookup, ledger insert and tier check run as one transaction
+                with get_db_pool().acquire() as conn:
+                    result = record_purchase(conn, customer_email, purchase_amount, order_id)
+                if result is None:
+                    st.error("Customer email not found.")
+                else:
+                    points_added, new_tier = result
+                    st.success(f"Successfully added {points_added} points for customer {customer_email} (Order: {order_id}).")
+                    if new_tier:
+                        st.success(f"Customer tier updated to {new_tier}!")
+            except Exception as e:
+                st.error(f"Failed to add points: {e}")
 
 elif page == "Redeem Reward":
     st.header("🎁 Redeem Reward")
 
-    customer_email = st.text_input("Enter Customer Email:", key="customer_email_input_redeem")
+    customer_email = st.text_input("Enter Customer Email:", key="customer_email_input_redeem",
+                                   on_change=_clear_cached_customer)
 
     if customer_email:
-        customer = get_customer_by_email(customer_email)
+        customer = resolve_customer(customer_email)
         if customer:
             st.write(f"Redeeming for: **{customer['first_name']} {customer['last_name']}**")
             current_balance = get_customer_point_balance(customer['customer_id'])
@@ -220,27 +549,25 @@ elif page == "Redeem Reward":
             if not rewards:
                 st.warning("No rewards currently available.")
             else:
-                # Create a list of reward options for the selectbox
-                reward_options = {f"{r['name']} ({r['points_cost']} Points)": r['reward_id'] for r in rewards}
+                # Map display label straight to the reward row so the click
+                # handler is a dict hit instead of a linear search
+                reward_options = {f"{r['name']} ({r['points_cost']} Points)": r for r in rewards}
                 selected_reward_display = st.selectbox("Select Reward to Redeem:", options=reward_options.keys(), key="reward_select")
 
                 if st.button("Redeem Selected Reward", key="redeem_button"):
-                    selected_reward_id = reward_options[selected_reward_display]
-                    
-                    # Find the cost of the selected reward
-                    selected_reward_cost = next((r['points_cost'] for r in rewards if r['reward_id'] == selected_reward_id), None)
-
-                    if selected_reward_cost is None:
-                        st.error("Selected reward not found.")
-                    elif current_balance >= selected_reward_cost:
+                    selected_reward = reward_options[selected_reward_display]
+                    selected_reward_cost = selected_reward['points_cost']
+
+                    if current_balance >= selected_reward_cost:
                         try:
-                            # Add a negative transaction to the ledger
-                            add_points_transaction(
-                                customer['customer_id'],
-                                -selected_reward_cost, # Note the negative sign
-                                'redeem',
-                                f"Redeemed: {selected_reward_display.split(' (')[0]}" # Get only the name
-                            )
+                            # Record the redemption as one committed transaction
+                            with get_db_pool().acquire() as conn:
+                                record_redemption(
+                                    conn,
+                                    customer['customer_id'],
+                                    selected_reward_cost,
+                                    selected_reward['name']
+                                )
                             st.success(f"Successfully redeemed {selected_reward_display}! {selected_reward_cost} points deducted.")
                             st.balloons()
                             # Refresh balance display (optional, Streamlit often handles this)
@@ -265,15 +592,38 @@ elif page == "Customer Service":
         if not customer_email or points_to_adjust == 0 or not reason:
             st.warning("Please fill in all fields (Points cannot be zero).")
         else:
-            customer = get_customer_by_email(customer_email)
-            if customer:
-                try:
-                    add_points_transaction(customer['customer_id'], points_to_adjust, 'manual_adjust', reason)
+            try:
+                # Lookup, ledger insert and tier check run as one transaction
+                with get_db_pool().acquire() as conn:
+                    result = record_adjustment(conn, customer_email, points_to_adjust, reason)
+                if result is False:
+                    st.error("Customer email not found.")
+                else:
                     st.success(f"Successfully adjusted points by {points_to_adjust} for {customer_email}. Reason: {reason}")
-                    # Check and update tier after adjustment
-                    update_customer_tier(customer['customer_id'])
-                except Exception as e:
-                    st.error(f"Failed to adjust points: {e}")
+                    if result:
+                        st.success(f"Customer tier updated to {result}!")
+            except Exception as e:
+                st.error(f"Failed to adjust points: {e}")
+
+    st.markdown("---")
+    st.subheader("📄 Bulk Adjustment (CSV Upload)")
+    uploaded_csv = st.file_uploader("Upload a CSV with columns: email, points, reason", type="csv", key="bulk_adjust_csv")
+
+    if uploaded_csv is not None and st.button("Apply Bulk Adjustments", key="bulk_adjust_button"):
+        try:
+            bulk_df = pd.read_csv(uploaded_csv)
+            missing_columns = {'email', 'points', 'reason'} - set(bulk_df.columns)
+            if missing_columns:
+                st.error(f"CSV is missing columns: {', '.join(sorted(missing_columns))}")
             else:
-                st.error("Customer email not found.")
+                adjustments = [(row.email, int(row.points), str(row.reason))
+                               for row in bulk_df.itertuples(index=False)]
+                # The whole batch commits as one transaction with one fsync
+                with get_db_pool().acquire() as conn:
+                    applied, unknown_emails = record_bulk_adjustments(conn, adjustments)
+                st.success(f"Applied {applied} adjustments in one transaction.")
+                if unknown_emails:
+                    st.warning(f"Skipped unknown emails: {', '.join(unknown_emails)}")
+        except Exception as e:
+            st.error(f"Failed to apply bulk adjustments: {e}")
                 
\ No newline at end of file